@@ -1,9 +1,15 @@
 import streamlit as st
-import json
+import orjson
 import re
 import httpx
 from httpx import ReadTimeout
 import asyncio
+import math
+import time
+import hashlib
+import concurrent.futures
+import threading
+import weakref
 
 # Page config
 st.set_page_config(
@@ -12,49 +18,30 @@ st.set_page_config(
     layout="wide"
 )
 
-def load_api_key():
-    """Load API key from Streamlit secrets"""
-    try:
-        api_key = st.secrets["ANTHROPIC_API_KEY"]
-        return api_key
-    except KeyError:
-        st.error("❌ ANTHROPIC_API_KEY not found in Streamlit secrets.")
-        return None
+# Precompiled pattern used by sanitize_json_response
+_WS_RE = re.compile(r'\s+')
 
-def sanitize_json_response(raw_text: str) -> str:
-    """
-    Sanitize the JSON response from Claude to handle common parsing issues
-    """
-    # Remove any leading/trailing whitespace
-    raw_text = raw_text.strip()
-    
-    # Extract JSON from markdown code blocks if present
-    json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', raw_text, re.DOTALL)
-    if json_match:
-        raw_text = json_match.group(1)
-    
-    # Remove any non-JSON content before the first {
-    start_idx = raw_text.find('{')
-    if start_idx > 0:
-        raw_text = raw_text[start_idx:]
-    
-    # Remove any content after the last }
-    end_idx = raw_text.rfind('}')
-    if end_idx != -1:
-        raw_text = raw_text[:end_idx + 1]
-    
-    # Fix common JSON issues
-    raw_text = raw_text.replace('\n', ' ')  # Replace newlines with spaces
-    raw_text = re.sub(r'\s+', ' ', raw_text)  # Replace multiple spaces with single space
-    
-    return raw_text.strip()
+# Largest upload sent to Claude in one request; keeps the prompt well inside Haiku's 200k-token context
+MAX_TRANSCRIPT_BYTES = 500_000
 
-async def call_claude_for_digest(transcript_text: str):
-    api_key = load_api_key()
-    if not api_key:
-        return {"error": "Missing ANTHROPIC_API_KEY in environment"}
+# Precompiled patterns used by minify_transcript
+_LINE_BREAKS_RE = re.compile(r'[ \t\r]*\n[ \t\r\n]*')
+_SPACE_RUNS_RE = re.compile(r'[ \t]{2,}')
+
+# Upper bound on concurrent Claude requests when several transcripts are analyzed together
+MAX_CONCURRENT_DIGESTS = 8
+
+# How long a successful digest is reused for an identical transcript, in seconds
+DIGEST_CACHE_TTL = 3600
 
-    prompt = f"""
+# Longest excerpt of an error response body kept in the error result
+ERROR_DETAILS_BYTES = 512
+
+# Upper bound on waiting for one Claude request from the script thread, in seconds
+DIGEST_TIMEOUT = 90.0
+
+# Static prompt; the transcript is spliced in at the {TRANSCRIPT} placeholder
+_PROMPT_TEMPLATE = """
 You are a startup analyst reviewing a transcript of a conversation between a startup founder and a subject matter expert (SME).
 
 Your goal is to extract **feedback, suggestions, and strategic guidance** given by the SME to the founder.
@@ -66,36 +53,36 @@ CRITICAL: You must identify and rank insights based on their potential impact an
 - Transformative business model changes
 
 ONLY output a valid JSON object in this EXACT format (no additional text, no markdown):
-{{
+{
   "insights": [
-    {{
+    {
       "insight": "detailed description of the insight",
       "confidence_score": 8.5,
       "impact_level": "game_changer",
       "reasoning": "why this insight is important and impactful"
-    }},
-    {{
+    },
+    {
       "insight": "detailed description of the insight",
       "confidence_score": 7.2,
       "impact_level": "high_impact",
       "reasoning": "why this insight is important and impactful"
-    }}
+    }
   ],
   "quotes": [
-    {{
+    {
       "timestamp": "mm:ss",
       "quote": "exact quote from SME",
       "relevance_score": 9.0,
       "context": "brief context of why this quote is significant"
-    }},
-    {{
+    },
+    {
       "timestamp": "mm:ss", 
       "quote": "exact quote from SME",
       "relevance_score": 8.5,
       "context": "brief context of why this quote is significant"
-    }}
+    }
   ]
-}}
+}
 
 Guidelines:
 - Extract ALL significant insights (not limited to 4) - could be 2-10+ insights
@@ -109,71 +96,226 @@ Guidelines:
 
 Transcript:
 \"\"\"
-{transcript_text}
+{TRANSCRIPT}
 \"\"\"
 """
 
+# Request payload serialized once around a null placeholder for the prompt
+_PAYLOAD_PREFIX, _PAYLOAD_SUFFIX = orjson.dumps({
+    "model": "claude-3-haiku-20240307",
+    "max_tokens": 2048,  # Increased to handle more insights
+    "temperature": 0.3,  # Slightly lower for more consistent JSON
+    "messages": [{"role": "user", "content": None}]
+}).split(b"null")
+
+def load_api_key():
+    """Load API key from Streamlit secrets"""
+    try:
+        api_key = st.secrets["ANTHROPIC_API_KEY"]
+        return api_key
+    except KeyError:
+        st.error("❌ ANTHROPIC_API_KEY not found in Streamlit secrets.")
+        return None
+
+def _extract_json_object(s: str) -> str:
+    """
+    Return the first balanced {...} object in s using a single left-to-right scan.
+    Braces inside quoted strings are ignored. If a ``` fence is present the scan starts
+    inside it, so stray braces in prose before the fenced JSON are skipped.
+    """
+    start = s.find('{')
+    fence_idx = s.find('```')
+    if fence_idx != -1:
+        fenced_start = s.find('{', fence_idx)
+        if fenced_start != -1:
+            start = fenced_start
+    if start == -1:
+        return s
+    
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(start, len(s)):
+        ch = s[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return s[start:i + 1]
+    
+    # Unbalanced (e.g. truncated) output: return everything from the first {
+    return s[start:]
+
+def sanitize_json_response(raw_text: str) -> str:
+    """
+    Sanitize the JSON response from Claude to handle common parsing issues
+    """
+    # Strip markdown fences and any text around the JSON object
+    raw_text = _extract_json_object(raw_text)
+    
+    # Raw newlines/tabs inside strings are invalid JSON, so collapse all whitespace
+    raw_text = _WS_RE.sub(' ', raw_text)
+    
+    return raw_text.strip()
+
+def minify_transcript(transcript_text: str) -> str:
+    """
+    Collapse blank lines and runs of spaces so fewer whitespace tokens are sent to Claude.
+    Single line breaks are kept so speaker turns and timestamps stay on their own lines.
+    """
+    transcript_text = _SPACE_RUNS_RE.sub(' ', transcript_text)
+    transcript_text = _LINE_BREAKS_RE.sub('\n', transcript_text)
+    return transcript_text.strip()
+
+def _run_loop(loop):
+    """Thread target: run the shared loop until it is stopped, then release it"""
+    loop.run_forever()
+    loop.close()
+
+def _shutdown_runtime(loop, client):
+    """Close the shared client on the loop that owns its connections, then stop the loop"""
+    if loop.is_running():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+
+class _AsyncRuntime:
+    """
+    Event loop running in a daemon thread, plus the AsyncClient whose connections live on it.
+    Shared by every session so keep-alive connections are reused across analyses.
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=_run_loop, args=(self.loop,), name="transcript-digest-loop", daemon=True).start()
+        self.client = httpx.AsyncClient(
+            timeout=45.0,  # Increased timeout
+            limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=30),
+            http2=True  # Requires httpx[http2]
+        )
+        # Runs when the runtime is dropped from the resource cache, or at interpreter exit
+        weakref.finalize(self, _shutdown_runtime, self.loop, self.client)
+
+@st.cache_resource
+def _runtime() -> _AsyncRuntime:
+    """Return the process-wide runtime; module globals are re-created on every rerun, so it lives in the resource cache"""
+    return _AsyncRuntime()
+
+def _get_client() -> httpx.AsyncClient:
+    """Return the shared AsyncClient so keep-alive connections are reused"""
+    return _runtime().client
+
+async def _status_error(response: httpx.Response) -> dict:
+    """
+    Build the error result for a failed request, reading at most ERROR_DETAILS_BYTES of the body.
+    Rate limits are reported with the server's Retry-After hint instead of the body.
+    """
+    if response.status_code == 429:
+        retry_after = response.headers.get("retry-after")
+        message = "Claude API rate limit reached."
+        if retry_after:
+            # Retry-After is either delta-seconds or an HTTP-date
+            if retry_after.isdigit():
+                message += f" Retry after {retry_after} seconds."
+            else:
+                message += f" Retry after {retry_after}."
+        return {
+            "error": message,
+            "status": response.status_code,
+            "retry_after": retry_after
+        }
+
+    details = "<binary>"
+    content_type = response.headers.get("content-type", "")
+    if content_type.startswith(("text/", "application/json")):
+        excerpt = b""
+        async for chunk in response.aiter_bytes():
+            excerpt += chunk
+            if len(excerpt) >= ERROR_DETAILS_BYTES:
+                break
+        details = excerpt[:ERROR_DETAILS_BYTES].decode("utf-8", errors="replace")
+
+    return {
+        "error": "Claude API request failed",
+        "status": response.status_code,
+        "details": details
+    }
+
+async def call_claude_for_digest(transcript_text: str, api_key: str, client: httpx.AsyncClient):
+    # The key and client are resolved on the script thread; this coroutine runs on the shared loop
+    if not api_key:
+        return {"error": "Missing ANTHROPIC_API_KEY in environment"}
+
+    prompt = _PROMPT_TEMPLATE.replace("{TRANSCRIPT}", minify_transcript(transcript_text))
+
     headers = {
         "x-api-key": api_key,
         "anthropic-version": "2023-06-01",
         "content-type": "application/json"
     }
 
-    payload = {
-        "model": "claude-3-haiku-20240307",
-        "max_tokens": 2048,  # Increased to handle more insights
-        "temperature": 0.3,  # Slightly lower for more consistent JSON
-        "messages": [{"role": "user", "content": prompt}]
-    }
+    # Only the prompt is serialized per call; the rest of the payload is pre-encoded
+    request_body = _PAYLOAD_PREFIX + orjson.dumps(prompt) + _PAYLOAD_SUFFIX
 
     try:
-        async with httpx.AsyncClient(timeout=45.0) as client:  # Increased timeout
-            response = await client.post(
-                "https://api.anthropic.com/v1/messages",
-                headers=headers,
-                json=payload
-            )
+        async with client.stream(
+            "POST",
+            "https://api.anthropic.com/v1/messages",
+            headers=headers,
+            content=request_body
+        ) as response:
+            if response.status_code != 200:
+                return await _status_error(response)
+            body = b"".join([chunk async for chunk in response.aiter_bytes()])
     except ReadTimeout:
         return {
             "error": "Claude API timed out after 45 seconds. Try again or reduce transcript length."
         }
-
-    if response.status_code != 200:
+    except httpx.HTTPError as e:
+        # Connection and protocol failures stay local to this transcript when batching
         return {
             "error": "Claude API request failed",
-            "status": response.status_code,
-            "details": response.text
+            "exception": str(e)
         }
 
-    data = response.json()
+    try:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        return {
+            "error": "Claude API returned a response that is not valid JSON",
+            "json_error": str(e),
+            "details": body[:ERROR_DETAILS_BYTES].decode("utf-8", errors="replace")
+        }
 
     try:
-        # Extract the actual text and sanitize it
+        # Extract the actual text
         raw_text = data["content"][0]["text"]
-        sanitized_text = sanitize_json_response(raw_text)
-        
-        # Parse the sanitized JSON
-        result_json = json.loads(sanitized_text)
+        sanitized_text = raw_text
         
-        # Sort insights by confidence score (highest first)
-        if "insights" in result_json:
-            result_json["insights"] = sorted(
-                result_json["insights"], 
-                key=lambda x: x.get("confidence_score", 0), 
-                reverse=True
-            )
+        try:
+            # Fast path: Claude usually returns clean JSON as instructed
+            result_json = orjson.loads(raw_text)
+        except orjson.JSONDecodeError:
+            # Fall back to sanitizing and parsing again
+            sanitized_text = sanitize_json_response(raw_text)
+            result_json = orjson.loads(sanitized_text)
         
-        # Sort quotes by relevance score (highest first)
-        if "quotes" in result_json:
-            result_json["quotes"] = sorted(
-                result_json["quotes"], 
-                key=lambda x: x.get("relevance_score", 0), 
-                reverse=True
-            )
+        # Sort insights by confidence and quotes by relevance (highest first), in place
+        for key, score_key in (("insights", "confidence_score"), ("quotes", "relevance_score")):
+            if key in result_json:
+                result_json[key].sort(key=lambda x: x.get(score_key, 0.0), reverse=True)
         
         return result_json
         
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         # Enhanced error handling with more context
         return {
             "error": "Failed to parse Claude response as JSON",
@@ -188,18 +330,112 @@ Transcript:
             "raw_response": data
         }
 
-def run_async_function(func, *args):
+def run_async_function(func, *args, timeout=DIGEST_TIMEOUT):
     """Helper function to run async functions in Streamlit"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    # Runs on the shared runtime's loop, which stays open so pooled connections survive
+    future = asyncio.run_coroutine_threadsafe(func(*args), _runtime().loop)
     try:
-        return loop.run_until_complete(func(*args))
-    finally:
-        loop.close()
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise TimeoutError(f"Timed out after {timeout:.0f} seconds waiting for Claude") from None
+
+def transcript_hash(transcript_text: str) -> str:
+    """Content hash identifying a transcript in the digest cache and saved results"""
+    return hashlib.blake2b(transcript_text.encode(), digest_size=16).hexdigest()
+
+async def digest_many(transcript_texts: list, api_key: str, client: httpx.AsyncClient) -> list:
+    """Digest several transcripts concurrently, with at most MAX_CONCURRENT_DIGESTS requests in flight"""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_DIGESTS)
+
+    async def _one(transcript_text):
+        async with semaphore:
+            return await call_claude_for_digest(transcript_text, api_key, client)
+
+    return await asyncio.gather(*(_one(t) for t in transcript_texts))
+
+class _DigestCache:
+    """Thread-safe map of transcript hash -> successful digest, with entries expiring after a TTL"""
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, text_hash: str):
+        """Return the cached digest for text_hash, or None if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(text_hash)
+            if entry is None:
+                return None
+            result, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[text_hash]
+                return None
+            return result
+
+    def put(self, text_hash: str, result: dict):
+        """Store a digest, dropping any expired entries"""
+        with self._lock:
+            now = time.monotonic()
+            self._entries = {k: v for k, v in self._entries.items() if v[1] > now}
+            self._entries[text_hash] = (result, now + self.ttl)
+
+@st.cache_resource
+def _digest_cache() -> _DigestCache:
+    """Return the process-wide digest cache shared by all sessions"""
+    return _DigestCache(DIGEST_CACHE_TTL)
+
+def get_digests(transcript_texts: list, api_key: str) -> list:
+    """Return a digest per transcript, serving identical transcripts from the cache"""
+    cache = _digest_cache()
+    hashes = [transcript_hash(text) for text in transcript_texts]
+    
+    # Look up every transcript first so only uncached ones hit the API
+    results = {}
+    pending = {}
+    for text_hash, transcript_text in zip(hashes, transcript_texts):
+        cached = cache.get(text_hash)
+        if cached is not None:
+            results[text_hash] = cached
+        else:
+            pending[text_hash] = transcript_text
+    
+    if pending:
+        rounds = math.ceil(len(pending) / MAX_CONCURRENT_DIGESTS)
+        fresh = run_async_function(
+            digest_many, list(pending.values()), api_key, _get_client(),
+            timeout=DIGEST_TIMEOUT * rounds
+        )
+        for text_hash, result in zip(pending, fresh):
+            # Failures such as timeouts are returned but not cached, so they can be retried
+            if not result.get("error"):
+                cache.put(text_hash, result)
+            results[text_hash] = result
+    
+    return [results[text_hash] for text_hash in hashes]
+
+@st.fragment
+def _render_results(result: dict, file_name: str, index: int):
+    """Render the analysis results; interactions here rerun only this fragment"""
+    st.markdown(f"### 📄 {file_name}")
+    
+    # Display the JSON output exactly as the original code
+    st.json(result)
+    
+    # Optional: Add download button for the JSON result
+    if not result.get("error"):
+        json_str = orjson.dumps(result, option=orjson.OPT_INDENT_2).decode()
+        st.download_button(
+            label="💾 Download JSON Result",
+            data=json_str,
+            file_name=f"transcript_digest_{file_name.split('.')[0]}.json",
+            mime="application/json",
+            key=f"download_{index}"
+        )
 
 def main():
     st.title("📝 Transcript Digest")
-    st.markdown("Upload a transcript to extract insights and strategic guidance from SME conversations.")
+    st.markdown("Upload transcripts to extract insights and strategic guidance from SME conversations.")
     
     # Check if API key is available
     api_key = load_api_key()
@@ -209,41 +445,54 @@ def main():
         st.success("✅ ANTHROPIC_API_KEY loaded successfully")
     
     # File upload
-    uploaded_file = st.file_uploader(
-        "Upload transcript file", 
+    uploaded_files = st.file_uploader(
+        "Upload transcript files", 
         type=['txt', 'md'],
-        help="Upload a text file containing the transcript"
+        accept_multiple_files=True,
+        help="Upload one or more text files containing transcripts"
     )
     
-    if uploaded_file is not None:
-        # Read the file content
+    if uploaded_files:
+        # Read the file contents
         try:
-            transcript_text = uploaded_file.read().decode("utf-8")
-            
-            # Display file info
-            st.info(f"📄 File uploaded: {uploaded_file.name} ({len(transcript_text)} characters)")
+            # (name, text, hash) per upload; names may repeat, so they are only used for display
+            transcripts = []
+            for uploaded_file in uploaded_files:
+                data = uploaded_file.getvalue()
+                if len(data) > MAX_TRANSCRIPT_BYTES:
+                    st.error(
+                        f"❌ {uploaded_file.name} is too large for a single Claude call "
+                        f"({MAX_TRANSCRIPT_BYTES // 1000}KB max)"
+                    )
+                    continue
+                transcript_text = data.decode("utf-8", errors="replace")
+                transcripts.append((uploaded_file.name, transcript_text, transcript_hash(transcript_text)))
+                
+                # Display file info
+                st.info(f"📄 File uploaded: {uploaded_file.name} ({len(transcript_text)} characters)")
             
             # Process button
-            if st.button("🔍 Analyze Transcript", type="primary"):
-                with st.spinner("Processing transcript with Claude..."):
-                    # Call the async function
-                    result = run_async_function(call_claude_for_digest, transcript_text)
-                    
-                    # Display results
-                    st.markdown("## 📊 Analysis Results")
-                    
-                    # Display the JSON output exactly as the original code
-                    st.json(result)
-                    
-                    # Optional: Add download button for the JSON result
-                    if not result.get("error"):
-                        json_str = json.dumps(result, indent=2)
-                        st.download_button(
-                            label="💾 Download JSON Result",
-                            data=json_str,
-                            file_name=f"transcript_digest_{uploaded_file.name.split('.')[0]}.json",
-                            mime="application/json"
-                        )
+            if transcripts and st.button("🔍 Analyze Transcripts", type="primary"):
+                with st.spinner(f"Processing {len(transcripts)} transcript(s) with Claude..."):
+                    # Uncached transcripts are sent to Claude concurrently
+                    results = get_digests([text for _, text, _ in transcripts], api_key)
+                    st.session_state["last_results"] = {
+                        text_hash: result
+                        for (_, _, text_hash), result in zip(transcripts, results)
+                    }
+            
+            # Results survive reruns so the download buttons don't clear them.
+            # They are keyed on content, so a different file with the same name shows nothing stale.
+            last_results = st.session_state.get("last_results", {})
+            shown = [
+                (index, name, last_results[text_hash])
+                for index, (name, _, text_hash) in enumerate(transcripts)
+                if text_hash in last_results
+            ]
+            if shown:
+                st.markdown("## 📊 Analysis Results")
+                for index, name, result in shown:
+                    _render_results(result, name, index)
                     
         except Exception as e:
             st.error(f"❌ Error processing file: {str(e)}")
@@ -251,8 +500,8 @@ def main():
     # Instructions
     with st.expander("ℹ️ Instructions"):
         st.markdown("""
-        1. **Upload**: Select a transcript file (.txt or .md)
-        2. **Analyze**: Click the "Analyze Transcript" button
+        1. **Upload**: Select one or more transcript files (.txt or .md)
+        2. **Analyze**: Click the "Analyze Transcripts" button
         3. **Review**: The system will extract insights and quotes from SME conversations
         4. **Download**: Save the JSON results for later use
         